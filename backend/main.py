@@ -1,4 +1,6 @@
 import os
+from contextlib import asynccontextmanager
+import anyio
 from fastapi import FastAPI, HTTPException, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
@@ -17,10 +19,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Sync endpoints run on anyio's threadpool; its default of 40 threads caps concurrency
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 100))
+
+def warm_up():
+    """
+    Load the embedding model, vector store, LLM client and graph ahead of time
+    so the first request doesn't pay for model loading and compilation.
+    """
+    from rag.embeddings import embed_texts
+    from rag.retriever import get_vectorstore
+    from rag.graph_chat import build_graph, get_llm
+    
+    embed_texts(["warmup"])
+    get_vectorstore()
+    get_llm()
+    build_graph()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure and warm up shared resources on startup."""
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    try:
+        await anyio.to_thread.run_sync(warm_up)
+        logger.info("Warm-up complete")
+    except Exception as e:
+        # Don't block startup; the first request will retry lazily
+        logger.warning(f"Warm-up failed: {str(e)}")
+    yield
+
 app = FastAPI(
     title="Jarvis Auto-RAG API",
     description="Intelligent RAG system with URL ingestion",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -62,9 +94,10 @@ async def global_exception_handler(request, exc):
     )
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
+def chat(req: ChatRequest):
     """
     Process a chat query with RAG.
+    Declared sync so FastAPI runs the blocking pipeline in its threadpool.
     
     - Automatically detects and ingests URLs in the query
     - Uses vector search for relevant context
@@ -139,9 +172,14 @@ def health():
 
 if __name__ == "__main__":
     import uvicorn
+    # loop/http "auto" pick uvloop and httptools when installed (uvicorn[standard]).
+    # Each worker is a separate process with its own model instance.
     uvicorn.run(
-        app,
+        "main:app",
         host="0.0.0.0",
         port=int(os.getenv("PORT", 8000)),
+        workers=int(os.getenv("WORKERS", 1)),
+        loop="auto",
+        http="auto",
         log_level="info"
     )
\ No newline at end of file
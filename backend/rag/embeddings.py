@@ -1,5 +1,41 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from functools import lru_cache
+from typing import List, Tuple
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE") or ("cuda" if torch.cuda.is_available() else "cpu")
+# GPUs stay efficient at larger batches than CPUs
+ENCODE_BATCH_SIZE = 128 if EMBEDDING_DEVICE.startswith("cuda") else 64
+QUERY_CACHE_SIZE = 1024
+
+# Concurrent query embeddings are coalesced into batches of up to this many,
+# waiting at most this long for more queries to arrive
+QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", 16))
+QUERY_BATCH_DELAY = float(os.getenv("QUERY_BATCH_DELAY_MS", 10)) / 1000
+
+# CPU only: "onnx" runs the INT8-quantized export shipped with the model through
+# ONNX Runtime; "torch" loads the plain FP32 PyTorch weights
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")
+ONNX_MODEL_FILE = os.getenv("ONNX_MODEL_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+def _model_kwargs() -> dict:
+    """SentenceTransformer constructor arguments for the configured device and backend."""
+    if EMBEDDING_DEVICE.startswith("cuda"):
+        # FP16 weights halve memory traffic and run on tensor cores
+        return {'device': EMBEDDING_DEVICE, 'model_kwargs': {'torch_dtype': torch.float16}}
+    if EMBEDDING_BACKEND == "onnx":
+        return {
+            'device': 'cpu',
+            'backend': 'onnx',
+            'model_kwargs': {'file_name': ONNX_MODEL_FILE, 'provider': 'CPUExecutionProvider'}
+        }
+    return {'device': EMBEDDING_DEVICE}
 
 @lru_cache(maxsize=1)
 def get_embeddings():
@@ -8,7 +44,104 @@ def get_embeddings():
     Loading the model once improves performance significantly.
     """
     return HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L6-v2",
-        model_kwargs={'device': 'cpu'},  # Change to 'cuda' if GPU available
+        model_name=EMBEDDING_MODEL,
+        model_kwargs=_model_kwargs(),
         encode_kwargs={'normalize_embeddings': True}
-    )
\ No newline at end of file
+    )
+
+def get_sentence_model():
+    """Get the underlying SentenceTransformer shared with get_embeddings()."""
+    return get_embeddings().client
+
+def embed_texts(texts: List[str]):
+    """
+    Embed many texts in a single batched forward pass.
+    Returns a numpy array of L2-normalized vectors, one row per text.
+    """
+    return get_sentence_model().encode(
+        texts,
+        batch_size=ENCODE_BATCH_SIZE,
+        show_progress_bar=False,
+        normalize_embeddings=True,
+        convert_to_numpy=True
+    )
+
+class QueryBatcher:
+    """
+    Dynamic batcher for query embeddings.
+    Callers on different request threads submit single queries; a background
+    worker drains the queue and embeds everything waiting in one encode() call,
+    then hands each vector back to the thread that asked for it.
+    """
+    
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+    
+    def submit(self, text: str) -> List[float]:
+        """Embed one text, blocking until its batch has been encoded."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+    
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._worker.start()
+    
+    def _drain(self) -> list:
+        """Block for one item, then collect more until the batch fills or the delay expires."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _embed(self, batch: list):
+        """Encode a batch and resolve its futures; if it fails, retry each text alone."""
+        try:
+            vectors = embed_texts([text for text, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                # Only the text that actually fails should fail its caller
+                for item in batch:
+                    self._embed([item])
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector.tolist())
+    
+    def _run(self):
+        while True:
+            batch = self._drain()
+            try:
+                self._embed(batch)
+            except BaseException as e:
+                # Never let the worker die with callers still waiting on this batch
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+_query_batcher = QueryBatcher(QUERY_BATCH_SIZE, QUERY_BATCH_DELAY)
+
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def embed_query(query: str) -> Tuple[float, ...]:
+    """
+    Embed a single query, memoized on the raw query string.
+    Repeated queries skip the model entirely; misses go through the shared
+    batcher so concurrent requests share a forward pass. Returned as a tuple
+    so the cached vector can't be mutated by callers.
+    """
+    return tuple(_query_batcher.submit(query))
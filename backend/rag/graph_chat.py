@@ -1,18 +1,45 @@
 from typing import TypedDict, List
 import os
+import re
 from dotenv import load_dotenv
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
-from .retriever import get_retriever, get_vectorstore
-from .url_tools import extract_urls, ingest_url
+from .retriever import get_vectorstore
+from .embeddings import embed_query
+from .url_tools import extract_urls, ingest_urls
 from functools import lru_cache
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "0.5"))
 
+# Custom prompt that emphasizes using context
+QA_PROMPT = PromptTemplate(
+    template="""Use the following pieces of context to answer the question. 
+If the context doesn't contain relevant information to answer the question, say "I don't have enough information in the provided context to answer that question."
+
+Context:
+{context}
+
+Question: {question}
+
+Answer:""",
+    input_variables=["context", "question"]
+)
+
+# Phrases signalling the model couldn't answer from the context, matched in a
+# single case-insensitive pass over the answer
+NO_INFO_PHRASES = [
+    "don't have enough information",
+    "don't have information",
+    "context doesn't contain",
+    "not mentioned in",
+    "cannot find",
+    "no information"
+]
+NO_INFO_PATTERN = re.compile("|".join(map(re.escape, NO_INFO_PHRASES)), re.IGNORECASE)
+
 class ChatState(TypedDict):
     query: str
     urls: List[str]
@@ -44,13 +71,11 @@ def route_classify(state: ChatState) -> str:
     return "rag_query"
 
 def ingest_node(state: ChatState) -> ChatState:
-    """Ingest URLs with better error handling."""
-    for url in state["urls"]:
-        try:
-            ingest_url(url)
-            print(f"[INFO] Successfully ingested {url}")
-        except Exception as e:
-            print(f"[ERROR] Failed to ingest {url}: {str(e)}")
+    """Ingest URLs concurrently; failures are logged per URL."""
+    try:
+        ingest_urls(state["urls"])
+    except Exception as e:
+        print(f"[ERROR] Failed to store ingested URLs: {str(e)}")
     return state
 
 def rag_query_node(state: ChatState) -> ChatState:
@@ -61,10 +86,11 @@ def rag_query_node(state: ChatState) -> ChatState:
     llm = get_llm()
     vectorstore = get_vectorstore()
     
-    # Use similarity_search_with_score to get relevance scores
+    # Search by the cached query vector to get relevance scores
     try:
-        docs_with_scores = vectorstore.similarity_search_with_score(
-            state["query"], 
+        query_vector = list(embed_query(state["query"]))
+        docs_with_scores = vectorstore.similarity_search_by_vector_with_relevance_scores(
+            query_vector,
             k=5
         )
         
@@ -80,44 +106,14 @@ def rag_query_node(state: ChatState) -> ChatState:
             # Extract just the documents
             docs = [doc for doc, score in relevant_docs]
             
-            # Custom prompt that emphasizes using context
-            qa_prompt = PromptTemplate(
-                template="""Use the following pieces of context to answer the question. 
-If the context doesn't contain relevant information to answer the question, say "I don't have enough information in the provided context to answer that question."
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:""",
-                input_variables=["context", "question"]
-            )
-            
-            # Use RAG with relevant context
-            retriever = get_retriever()
-            qa = RetrievalQA.from_chain_type(
-                llm=llm,
-                retriever=retriever,
-                chain_type="stuff",
-                return_source_documents=True,
-                chain_type_kwargs={"prompt": qa_prompt}
-            )
-            
-            res = qa({"query": state["query"]})
-            answer = res["result"]
+            # Stuff the already-retrieved docs into the prompt instead of
+            # running a second retrieval through a chain
+            context = "\n\n".join(doc.page_content for doc in docs)
+            res = llm.invoke(QA_PROMPT.format(context=context, question=state["query"]))
+            answer = res.content
             
             # Check if the RAG system says it doesn't have info
-            no_info_phrases = [
-                "don't have enough information",
-                "don't have information",
-                "context doesn't contain",
-                "not mentioned in",
-                "cannot find",
-                "no information"
-            ]
-            
-            if any(phrase in answer.lower() for phrase in no_info_phrases):
+            if NO_INFO_PATTERN.search(answer):
                 # RAG couldn't answer, fall back to general LLM
                 print("[INFO] RAG couldn't answer, falling back to general LLM")
                 prompt = f"Answer this question conversationally:\n\n{state['query']}"
@@ -129,9 +125,8 @@ Answer:""",
                 # RAG provided a good answer
                 state["answer"] = answer
                 state["used_rag"] = True
-                if "source_documents" in res:
-                    sources = [doc.metadata.get("source", "unknown") for doc in res["source_documents"]]
-                    state["sources"] = list(set(sources))
+                sources = [doc.metadata.get("source", "unknown") for doc in docs]
+                state["sources"] = list(dict.fromkeys(sources))
         else:
             # No relevant documents found, use general LLM
             print(f"[INFO] No docs passed relevance threshold, using general LLM")
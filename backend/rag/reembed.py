@@ -0,0 +1,38 @@
+"""
+Re-embed every chunk in the vector store with the current embedding model.
+
+Run this after switching EMBEDDING_BACKEND, ONNX_MODEL_FILE or EMBEDDING_DEVICE
+so stored chunk vectors come from the same model variant as query vectors:
+
+    uv run python -m rag.reembed
+"""
+from .embeddings import embed_texts
+from .retriever import get_vectorstore
+
+REEMBED_PAGE_SIZE = 256
+
+def reembed_vectorstore() -> int:
+    """
+    Recompute the embedding of every stored chunk in place.
+    Ids, documents and metadata are untouched; only vectors are replaced.
+    
+    Returns:
+        Number of chunks re-embedded
+    """
+    collection = get_vectorstore()._collection
+    total = collection.count()
+    
+    done = 0
+    for offset in range(0, total, REEMBED_PAGE_SIZE):
+        page = collection.get(limit=REEMBED_PAGE_SIZE, offset=offset, include=["documents"])
+        if not page["ids"]:
+            break
+        vectors = embed_texts(page["documents"])
+        collection.update(ids=page["ids"], embeddings=vectors.tolist())
+        done += len(page["ids"])
+        print(f"[INFO] Re-embedded {done}/{total} chunks")
+    
+    return done
+
+if __name__ == "__main__":
+    reembed_vectorstore()
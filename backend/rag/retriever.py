@@ -8,6 +8,20 @@ load_dotenv()
 
 PERSIST_DIR = os.getenv("PERSIST_DIR", "data/chroma_db")
 
+# HNSW index parameters. M and construction_ef only apply when the collection is
+# first created; search_ef is also applied to an existing collection on startup.
+# Space stays "l2" (squared L2): with normalized embeddings it ranks identically
+# to cosine and keeps RELEVANCE_THRESHOLD's scale unchanged.
+# search_ef of 64 is below Chroma's default of 100, trading some recall for lower
+# query latency; raise HNSW_SEARCH_EF to favour recall.
+HNSW_SEARCH_EF = int(os.getenv("HNSW_SEARCH_EF", 64))
+HNSW_METADATA = {
+    "hnsw:space": "l2",
+    "hnsw:M": int(os.getenv("HNSW_M", 32)),
+    "hnsw:construction_ef": int(os.getenv("HNSW_CONSTRUCTION_EF", 200)),
+    "hnsw:search_ef": HNSW_SEARCH_EF,
+}
+
 # Singleton pattern for vector store
 _vectorstore_instance = None
 
@@ -19,11 +33,23 @@ def get_vectorstore():
         os.makedirs(PERSIST_DIR, exist_ok=True)
         _vectorstore_instance = Chroma(
             persist_directory=PERSIST_DIR,
-            embedding_function=get_embeddings()
+            embedding_function=get_embeddings(),
+            collection_metadata=HNSW_METADATA
         )
+        _apply_search_ef(_vectorstore_instance._collection)
     
     return _vectorstore_instance
 
+def _apply_search_ef(collection):
+    """
+    Bring an existing collection's ef_search in line with HNSW_SEARCH_EF.
+    Collection metadata is ignored once a collection exists, but ef_search
+    (unlike M and construction_ef) can still be modified in place.
+    """
+    hnsw = (collection.configuration or {}).get("hnsw") or {}
+    if hnsw.get("ef_search") != HNSW_SEARCH_EF:
+        collection.modify(configuration={"hnsw": {"ef_search": HNSW_SEARCH_EF}})
+
 def get_retriever(k: int = 5):
     """
     Return a retriever with configurable top-k results.
@@ -1,20 +1,41 @@
+import os
 import re
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from .retriever import get_vectorstore
+from .embeddings import embed_texts
 from urllib.parse import urlparse
-from typing import List
+from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import hashlib
 
 URL_PATTERN = re.compile(r"https?://\S+")
+MAX_FETCH_WORKERS = 8
+# Pages are streamed and cut off at this size to bound memory per fetch
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", 5 * 1024 * 1024))
 
-# Cache ingested URLs to avoid re-processing
+# Stateless, so one splitter is shared by every ingest
+TEXT_SPLITTER = RecursiveCharacterTextSplitter(
+    chunk_size=1000,
+    chunk_overlap=200,
+    length_function=len,
+    separators=["\n\n", "\n", ". ", " ", ""]
+)
+
+# In-process cache of ingested URL hashes; the vector store is the source of truth
 _ingested_urls = set()
 
 def extract_urls(text: str) -> List[str]:
     """Extract and validate URLs from text."""
+    # Most queries contain no URL; a substring check is far cheaper than the regex
+    if "http" not in text:
+        return []
+    
     urls = URL_PATTERN.findall(text)
     validated = []
     
@@ -28,23 +49,168 @@ def extract_urls(text: str) -> List[str]:
     
     return validated
 
-def extract_text_from_html(html: str) -> str:
-    """Extract clean text from HTML."""
-    soup = BeautifulSoup(html, "lxml")
+def extract_text_from_html(html: Union[str, bytes]) -> str:
+    """
+    Extract clean text from HTML.
+    Raw bytes are decoded by the parser using the document's <meta charset>,
+    falling back to UTF-8.
+    """
+    tree = LexborHTMLParser(html, encoding=isinstance(html, bytes))
     
     # Remove unwanted elements
-    for tag in soup(["script", "style", "noscript", "iframe", "nav", "footer", "header"]):
-        tag.decompose()
+    tree.strip_tags(["script", "style", "noscript", "iframe", "nav", "footer", "header"])
+    
+    if tree.root is None:
+        return ""
     
     # Get text with better formatting
-    text = soup.get_text(separator="\n", strip=True)
+    text = tree.root.text(separator="\n", strip=True)
     lines = [line.strip() for line in text.splitlines() if line.strip()]
     
     return "\n\n".join(lines)
 
+@lru_cache(maxsize=1)
+def _session() -> requests.Session:
+    """
+    Get a shared HTTP session.
+    Pooled keep-alive connections let repeat fetches to a host skip DNS and TCP/TLS setup.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=2, backoff_factor=0.3)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0 (compatible; Jarvis-RAG/1.0)",
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
+    })
+    return session
+
 def get_url_hash(url: str) -> str:
-    """Generate a hash for URL to track ingestion."""
-    return hashlib.md5(url.encode()).hexdigest()
+    """
+    Generate a hash for URL to track ingestion.
+    MD5 only identifies URLs here (no security role) and must match the
+    url_hash metadata already stored in the vector store.
+    """
+    return hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+
+def fetch_url(url: str) -> Union[str, bytes]:
+    """
+    Fetch raw HTML for a URL over the pooled session.
+    The body is streamed and capped at MAX_PAGE_BYTES. If the Content-Type
+    header declares a charset the body is decoded with it; otherwise the raw
+    bytes are returned for the parser to sniff a <meta charset> (or assume UTF-8).
+    """
+    with _session().get(url, timeout=15, stream=True) as resp:
+        resp.raise_for_status()
+        chunks, size = [], 0
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            if size + len(chunk) > MAX_PAGE_BYTES:
+                chunks.append(chunk[:MAX_PAGE_BYTES - size])
+                print(f"[WARN] Truncating {url} at {MAX_PAGE_BYTES} bytes")
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        # requests defaults text/* to ISO-8859-1 when no charset is given,
+        # so only trust resp.encoding if the header actually names one
+        declared = "charset=" in resp.headers.get("Content-Type", "").lower()
+        encoding = resp.encoding if declared else None
+    
+    body = b"".join(chunks)
+    del chunks
+    if encoding:
+        try:
+            return body.decode(encoding, errors="replace")
+        except LookupError:
+            pass  # Unknown charset name; let the parser detect it
+    return body
+
+def parse_and_chunk(html: Union[str, bytes]) -> List[str]:
+    """Extract text from HTML and split it into overlapping chunks."""
+    text = extract_text_from_html(html)
+    
+    # Validate content length
+    if len(text) < 50:
+        raise ValueError(f"Insufficient content: only {len(text)} characters")
+    
+    return TEXT_SPLITTER.split_text(text)
+
+def _load_chunks(url: str) -> List[str]:
+    """Fetch and chunk a URL, wrapping failures with a readable message."""
+    try:
+        return parse_and_chunk(fetch_url(url))
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"Failed to fetch URL: {str(e)}")
+    except Exception as e:
+        raise Exception(f"Error processing URL: {str(e)}")
+
+def embed_and_store(chunks_by_url: Dict[str, List[str]], replace: bool = False) -> List[Document]:
+    """
+    Embed chunks from any number of URLs in one batch and add them to the vector store.
+    Vectors are written straight to the collection so Chroma doesn't re-embed them.
+    With replace=True, each URL's existing chunks are deleted first so a page
+    that now yields fewer chunks doesn't leave stale ones behind.
+    """
+    ids, texts, metadatas = [], [], []
+    for url, chunks in chunks_by_url.items():
+        url_hash = get_url_hash(url)
+        for i, chunk in enumerate(chunks):
+            ids.append(f"{url_hash}-{i}")
+            texts.append(chunk)
+            metadatas.append({
+                "source": url,
+                "url_hash": url_hash,
+                "chunk_index": i,
+                "total_chunks": len(chunks)
+            })
+    
+    if not texts:
+        return []
+    
+    vectors = embed_texts(texts)
+    vectordb = get_vectorstore()
+    if replace:
+        vectordb._collection.delete(
+            where={"url_hash": {"$in": [get_url_hash(url) for url in chunks_by_url]}}
+        )
+    vectordb._collection.upsert(
+        ids=ids,
+        embeddings=vectors.tolist(),
+        documents=texts,
+        metadatas=metadatas
+    )
+    
+    # Mark as ingested
+    for url in chunks_by_url:
+        _ingested_urls.add(get_url_hash(url))
+    
+    return [
+        Document(page_content=text, metadata=metadata)
+        for text, metadata in zip(texts, metadatas)
+    ]
+
+def is_ingested(url: str) -> bool:
+    """
+    Check whether a URL's chunks are already in the vector store.
+    Looks in the in-process cache first, then the collection itself, so
+    URLs ingested before a restart aren't fetched and embedded again.
+    """
+    url_hash = get_url_hash(url)
+    if url_hash in _ingested_urls:
+        return True
+    
+    existing = get_vectorstore()._collection.get(
+        where={"url_hash": url_hash},
+        limit=1,
+        include=[]
+    )
+    if existing["ids"]:
+        _ingested_urls.add(url_hash)
+        return True
+    return False
 
 def ingest_url(url: str, force: bool = False) -> List[Document]:
     """
@@ -57,70 +223,62 @@ def ingest_url(url: str, force: bool = False) -> List[Document]:
     Returns:
         List of Document objects created
     """
-    url_hash = get_url_hash(url)
-    
     # Skip if already ingested (unless forced)
-    if not force and url_hash in _ingested_urls:
+    if not force and is_ingested(url):
         print(f"[INFO] URL already ingested: {url}")
         return []
     
+    chunks = _load_chunks(url)
     try:
-        # Fetch with better headers and timeout
-        headers = {
-            "User-Agent": "Mozilla/5.0 (compatible; Jarvis-RAG/1.0)",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"
-        }
-        resp = requests.get(url, headers=headers, timeout=15)
-        resp.raise_for_status()
-        
-        # Extract text
-        html = resp.text
-        text = extract_text_from_html(html)
-        
-        # Validate content length
-        if len(text) < 50:
-            raise ValueError(f"Insufficient content: only {len(text)} characters")
-        
-        # Split into chunks
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ". ", " ", ""]
-        )
-        chunks = splitter.split_text(text)
-        
-        # Create documents with metadata
-        docs = [
-            Document(
-                page_content=chunk,
-                metadata={
-                    "source": url,
-                    "url_hash": url_hash,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks)
-                }
-            )
-            for i, chunk in enumerate(chunks)
-        ]
-        
-        # Add to vector store
-        vectordb = get_vectorstore()
-        vectordb.add_documents(docs)
-        vectordb.persist()
-        
-        # Mark as ingested
-        _ingested_urls.add(url_hash)
-        
-        print(f"[INFO] Ingested {len(docs)} chunks from {url}")
-        return docs
-        
-    except requests.exceptions.RequestException as e:
-        raise Exception(f"Failed to fetch URL: {str(e)}")
+        docs = embed_and_store({url: chunks}, replace=force)
     except Exception as e:
         raise Exception(f"Error processing URL: {str(e)}")
+    
+    print(f"[INFO] Ingested {len(docs)} chunks from {url}")
+    return docs
+
+def ingest_urls(urls: List[str], force: bool = False) -> List[Document]:
+    """
+    Ingest several URLs at once.
+    Fetching and parsing run concurrently in a thread pool, then every URL's
+    chunks are embedded together in a single batch. A URL that fails to load
+    is logged and skipped without affecting the others.
+    
+    Args:
+        urls: The URLs to ingest
+        force: If True, re-ingest even if already processed
+    
+    Returns:
+        List of Document objects created
+    """
+    pending = []
+    for url in dict.fromkeys(urls):
+        if not force and is_ingested(url):
+            print(f"[INFO] URL already ingested: {url}")
+        else:
+            pending.append(url)
+    
+    if not pending:
+        return []
+    
+    def safe_load(url: str):
+        try:
+            return _load_chunks(url)
+        except Exception as e:
+            print(f"[ERROR] Failed to ingest {url}: {str(e)}")
+            return None
+    
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(pending))) as executor:
+        results = list(executor.map(safe_load, pending))
+    
+    chunks_by_url = {url: chunks for url, chunks in zip(pending, results) if chunks}
+    docs = embed_and_store(chunks_by_url, replace=force)
+    
+    for url in chunks_by_url:
+        print(f"[INFO] Successfully ingested {url}")
+    return docs
 
 def clear_ingestion_cache():
     """Clear the ingested URLs cache."""
     global _ingested_urls
-    _ingested_urls.clear()
\ No newline at end of file
+    _ingested_urls.clear()